@@ -6,47 +6,65 @@ Ce module fournit des fonctions pour encoder et décoder des messages secrets da
 images en utilisant la technique LSB (Least Significant Bit) avec chiffrement AES.
 """
 
+import functools
+import hashlib
 import os
+import struct
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Union, Tuple
+from typing import List, Union, Tuple
 from PIL import Image
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-import base64
+try:
+    import numpy as np
+except ImportError:
+    # Sans NumPy, les pixels sont traités en Python pur (plus lent)
+    np = None
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 # Constantes de sécurité
 MAX_MESSAGE_LENGTH = 1024 * 1024  # 1 MB
-ALLOWED_IMAGE_FORMATS = {'.png', '.jpg', '.jpeg', '.bmp'}
+ALLOWED_INPUT_FORMATS = {'.png', '.jpg', '.jpeg', '.bmp'}
+ALLOWED_OUTPUT_FORMATS = {'.png', '.bmp'}  # Formats sans perte : le JPEG détruirait les bits de poids faible
 SALT = b'ImageCypherSalt'  # Dans une vraie application, ce devrait être unique par utilisateur
+NONCE_SIZE = 12  # Taille du nonce AES-GCM en octets
+TAG_SIZE = 16  # Taille de l'étiquette d'authentification AES-GCM en octets
+HEADER_FORMAT = '>I'  # Longueur des données chiffrées, en octets (big-endian)
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
 
+# Constantes de performance
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024  # En dessous, un seul thread est plus rapide
+# Regroupement SWAR : 8 bits de poids faible chargés dans un entier de 64 bits
+# (masqués par SWAR_LSB_MASK) sont rassemblés dans l'octet de poids fort par une
+# seule multiplication. La constante dépend de l'ordre des octets de la machine.
+SWAR_LSB_MASK = 0x0101010101010101
+SWAR_GATHER = 0x8040201008040201 if sys.byteorder == 'little' else 0x0102040810204080
+PNG_COMPRESS_LEVEL = 1  # Des bits de poids faible aléatoires se compressent mal : inutile de chercher plus
+
+@functools.lru_cache(maxsize=8)
 def generate_key(password: str) -> bytes:
     """
     Génère une clé de chiffrement à partir d'un mot de passe.
     
+    Les clés dérivées sont mises en cache pour la durée du processus afin
+    d'éviter de répéter la dérivation PBKDF2 pour un même mot de passe.
+    
     Args:
         password (str): Mot de passe pour générer la clé
         
     Returns:
-        bytes: Clé de chiffrement
+        bytes: Clé AES-256 brute (32 octets)
     """
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=SALT,
-        iterations=100000,
-    )
-    key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-    return key
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), SALT, 100000, dklen=32)
 
-def validate_file_path(file_path: Union[str, Path], must_exist: bool = True) -> Path:
+def validate_file_path(file_path: Union[str, Path], must_exist: bool = True, for_output: bool = False) -> Path:
     """
     Valide et normalise un chemin de fichier.
     
     Args:
         file_path: Chemin du fichier à valider
         must_exist: Si True, vérifie que le fichier existe
+        for_output: Si True, applique la liste des formats de sortie (sans perte)
         
     Returns:
         Path: Chemin normalisé
@@ -58,12 +76,258 @@ def validate_file_path(file_path: Union[str, Path], must_exist: bool = True) ->
         path = Path(file_path).resolve()
         if must_exist and not path.is_file():
             raise ValueError(f"Le fichier {file_path} n'existe pas")
-        if path.suffix.lower() not in ALLOWED_IMAGE_FORMATS:
-            raise ValueError(f"Format de fichier non supporté. Formats acceptés : {', '.join(ALLOWED_IMAGE_FORMATS)}")
+        allowed_formats = ALLOWED_OUTPUT_FORMATS if for_output else ALLOWED_INPUT_FORMATS
+        if path.suffix.lower() not in allowed_formats:
+            raise ValueError(f"Format de fichier non supporté. Formats acceptés : {', '.join(allowed_formats)}")
         return path
     except Exception as e:
         raise ValueError(f"Chemin de fichier invalide : {str(e)}")
 
+def _as_rgb(img: Image.Image) -> Image.Image:
+    """
+    Normalise une image en mode RGB.
+    
+    Tout le traitement des pixels suppose trois octets par pixel (R, G, B) ; les images
+    RGBA, P ou L sont converties une seule fois à l'entrée, et une image déjà en RGB est
+    utilisée telle quelle pour éviter une copie inutile.
+    
+    Args:
+        img: Image à normaliser
+        
+    Returns:
+        Image.Image: Image en mode RGB
+    """
+    return img if img.mode == 'RGB' else img.convert('RGB')
+
+def _strip_bounds(size: int, align: int = 1) -> List[Tuple[int, int]]:
+    """
+    Découpe l'intervalle [0, size) en bandes contiguës, une par cœur disponible.
+    
+    Args:
+        size: Nombre total d'éléments à traiter
+        align: Les bornes internes sont des multiples de cette valeur
+        
+    Returns:
+        List[Tuple[int, int]]: Bornes (début, fin) de chaque bande
+    """
+    workers = os.cpu_count() or 1
+    if workers == 1 or size < PARALLEL_MIN_BYTES:
+        return [(0, size)]
+    step = -(-size // (workers * align)) * align
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+@functools.lru_cache(maxsize=None)
+def _numba_embed_kernel():
+    """
+    Charge à la première utilisation le noyau d'encodage compilé par Numba.
+    
+    Numba est optionnel et n'est importé qu'ici, pour ne pas ralentir le démarrage.
+    Le noyau lit directement les octets du message : le tableau des bits dépliés
+    (8 fois la taille du message) n'est jamais alloué. Chaque octet du message est
+    étalé sur 8 octets de canaux par une table de 256 mots de 64 bits, ce qui
+    remplace huit écritures d'un octet par une seule écriture de 64 bits.
+    
+    Returns:
+        Fonction embed(flat, data, start, end), start et end étant des multiples de 8,
+        ou None si Numba n'est pas installé
+    """
+    try:
+        import numba
+    except ImportError:
+        return None
+    
+    # spread[b] : octet k du mot = bit (7 - k) de b, soit l'ordre de np.unpackbits
+    spread = np.unpackbits(np.arange(256, dtype=np.uint8)).reshape(256, 8).copy().view(np.uint64).reshape(256)
+    
+    @numba.njit(cache=True, boundscheck=False, nogil=True)
+    def embed_kernel(words, payload, spread):
+        mask = np.uint64(0xFEFEFEFEFEFEFEFE)
+        for j in range(words.size):
+            words[j] = (words[j] & mask) | spread[payload[j]]
+    
+    def embed(flat, data, start, end):
+        embed_kernel(flat[start:end].view(np.uint64), data[start // 8:end // 8], spread)
+    
+    return embed
+
+def _embed_strip(flat: 'np.ndarray', bits: 'np.ndarray', start: int, end: int) -> None:
+    """Remplace en place les bits de poids faible de flat[start:end] par bits[start:end]."""
+    strip = flat[start:end]
+    strip &= 0xFE
+    strip |= bits[start:end]
+
+def _embed_payload(flat: 'np.ndarray', payload: bytes) -> None:
+    """
+    Écrit les bits du message dans les bits de poids faible des premiers octets de flat.
+    
+    Le noyau Numba est utilisé s'il est disponible ; sinon les octets du message sont
+    dépliés en bits avec NumPy. Les grandes images sont traitées par bandes en
+    parallèle : NumPy et le noyau Numba libèrent le GIL, et les threads partagent le
+    même tableau.
+    
+    Args:
+        flat: Octets des canaux de l'image, modifiés en place
+        payload: Octets à cacher (bit de poids fort en premier)
+    """
+    data = np.frombuffer(payload, dtype=np.uint8)
+    kernel = _numba_embed_kernel()
+    if kernel is not None:
+        strip = lambda start, end: kernel(flat, data, start, end)
+    else:
+        bits = np.unpackbits(data)
+        strip = lambda start, end: _embed_strip(flat, bits, start, end)
+    
+    bounds = _strip_bounds(data.size * 8, align=8)
+    if len(bounds) == 1:
+        strip(*bounds[0])
+        return
+    with ThreadPoolExecutor(max_workers=len(bounds)) as executor:
+        list(executor.map(lambda b: strip(*b), bounds))
+
+def _extract_strip(flat: 'np.ndarray', start: int, end: int) -> 'np.ndarray':
+    """Regroupe en octets les bits de poids faible de flat[start:end] (longueur multiple de 8)."""
+    return np.packbits(flat[start:end] & 1)
+
+def _extract_bytes(flat: 'np.ndarray', offset: int, count: int) -> bytes:
+    """
+    Reconstitue des octets cachés dans les bits de poids faible de flat.
+    
+    Args:
+        flat: Octets des canaux de l'image
+        offset: Position du premier octet caché à lire
+        count: Nombre d'octets cachés à lire
+        
+    Returns:
+        bytes: Octets extraits
+    """
+    start = offset * 8
+    bounds = _strip_bounds(count * 8, align=8)
+    if len(bounds) == 1:
+        return _extract_strip(flat, start, start + count * 8).tobytes()
+    with ThreadPoolExecutor(max_workers=len(bounds)) as executor:
+        strips = executor.map(lambda b: _extract_strip(flat, start + b[0], start + b[1]), bounds)
+        return np.concatenate(list(strips)).tobytes()
+
+def _embed_payload_pure(img: Image.Image, payload: bytes) -> Image.Image:
+    """
+    Variante sans NumPy de l'encodage des bits de poids faible.
+    
+    Les octets des canaux sont copiés une seule fois dans un bytearray modifié en
+    place, sans tuple ni liste intermédiaire par pixel.
+    
+    Args:
+        img: Image source en mode RGB
+        payload: Octets à cacher
+        
+    Returns:
+        Image.Image: Image encodée
+    """
+    buf = bytearray(img.tobytes())
+    index = 0
+    for byte in payload:
+        for shift in range(7, -1, -1):
+            buf[index] = (buf[index] & 0xFE) | ((byte >> shift) & 1)
+            index += 1
+    return Image.frombytes(img.mode, img.size, buf)
+
+def _extract_bytes_pure(channels: bytes, offset: int, count: int) -> bytes:
+    """Variante sans NumPy de _extract_bytes, sur les octets bruts des canaux."""
+    extracted = bytearray()
+    for start in range(offset * 8, (offset + count) * 8, 8):
+        word = int.from_bytes(channels[start:start + 8], sys.byteorder) & SWAR_LSB_MASK
+        extracted.append((word * SWAR_GATHER >> 56) & 0xFF)
+    return bytes(extracted)
+
+def _save_image(encoded: Image.Image, save_path: Path) -> None:
+    """
+    Sauvegarde une image encodée sans jamais laisser de fichier incomplet.
+    
+    L'image est écrite dans un fichier temporaire du même dossier, créé en mode
+    exclusif, puis renommée sur save_path. En cas d'échec, seul ce fichier temporaire
+    est supprimé : un fichier existant à save_path reste intact.
+    
+    Args:
+        encoded: Image à sauvegarder
+        save_path: Chemin validé de l'image encodée
+    """
+    image_format = Image.registered_extensions()[save_path.suffix.lower()]
+    options = {'compress_level': PNG_COMPRESS_LEVEL, 'optimize': False} if image_format == 'PNG' else {}
+    tmp_path = save_path.with_name(f".{save_path.name}.{os.getpid()}.tmp")
+    fp = open(tmp_path, 'xb')
+    try:
+        with fp:
+            encoded.save(fp, format=image_format, **options)
+        os.replace(tmp_path, save_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def _encode_with_key(input_path: Path, message: str, save_path: Path, key: bytes) -> None:
+    """
+    Chiffre un message avec une clé déjà dérivée et le cache dans une image.
+    
+    Les chemins et le message doivent avoir été validés par l'appelant. Fonction de
+    niveau module afin de pouvoir être exécutée dans un processus séparé.
+    
+    Args:
+        input_path: Chemin validé de l'image source
+        message: Message secret à cacher
+        save_path: Chemin validé où sauvegarder l'image
+        key: Clé AES-256 issue de generate_key
+        
+    Raises:
+        ValueError: Si le message est trop long pour l'image
+    """
+    # Chiffrement du message
+    aesgcm = AESGCM(key)
+    nonce = os.urandom(NONCE_SIZE)
+    encrypted_message = nonce + aesgcm.encrypt(nonce, message.encode(), None)
+    # Les données chiffrées sont précédées de leur longueur
+    payload = struct.pack(HEADER_FORMAT, len(encrypted_message)) + encrypted_message
+    
+    with Image.open(input_path) as img:
+        # Vérification de la capacité
+        width, height = img.size
+        if len(payload) * 8 > width * height * 3:
+            raise ValueError("Message trop long pour cette image")
+        
+        rgb = _as_rgb(img)
+        if np is not None:
+            # Chargement des pixels dans un tampon contigu modifiable
+            raw = bytearray(rgb.tobytes())
+            flat = np.frombuffer(raw, dtype=np.uint8)
+            
+            # Encodage du message chiffré dans les bits de poids faible
+            _embed_payload(flat, payload)
+            encoded = Image.frombytes('RGB', img.size, raw)
+        else:
+            encoded = _embed_payload_pure(rgb, payload)
+        
+        _save_image(encoded, save_path)
+
+def _validate_encode_inputs(image_path: Union[str, Path], message: str,
+                            output_path: Union[str, Path]) -> Tuple[Path, Path]:
+    """
+    Valide le message et les chemins d'un encodage, sans lire l'image ni chiffrer.
+    
+    Args:
+        image_path: Chemin vers l'image source
+        message: Message secret à cacher
+        output_path: Chemin où sauvegarder l'image
+        
+    Returns:
+        Tuple[Path, Path]: Chemins normalisés de l'image source et de l'image encodée
+        
+    Raises:
+        ValueError: Si le message ou l'un des chemins est invalide
+    """
+    if not message or len(message.encode()) > MAX_MESSAGE_LENGTH:
+        raise ValueError(f"Le message doit faire moins de {MAX_MESSAGE_LENGTH // 1024} KB")
+    # Le format de sortie est vérifié avant l'image source
+    save_path = validate_file_path(output_path, must_exist=False, for_output=True)
+    input_path = validate_file_path(image_path)
+    return input_path, save_path
+
 def secure_encode_image(image_path: Union[str, Path], message: str, output_path: Union[str, Path], password: str) -> None:
     """
     Encode et chiffre un message secret dans une image.
@@ -79,54 +343,53 @@ def secure_encode_image(image_path: Union[str, Path], message: str, output_path:
         IOError: Si une erreur survient lors de la manipulation des fichiers
     """
     try:
-        # Validation des entrées
-        if not message or len(message.encode()) > MAX_MESSAGE_LENGTH:
-            raise ValueError(f"Le message doit faire moins de {MAX_MESSAGE_LENGTH // 1024} KB")
+        input_path, save_path = _validate_encode_inputs(image_path, message, output_path)
+        _encode_with_key(input_path, message, save_path, generate_key(password))
         
-        input_path = validate_file_path(image_path)
-        output_path = validate_file_path(output_path, must_exist=False)
+        print("Message caché dans l'image avec succès.")
         
-        # Chiffrement du message
-        f = Fernet(generate_key(password))
-        encrypted_message = f.encrypt(message.encode())
-        binary_message = ''.join(format(b, '08b') for b in encrypted_message) + '1' * 8  # Marqueur de fin
+    except Exception as e:
+        print(f"Erreur lors de l'encodage : {str(e)}")
+        raise
+
+def secure_encode_images_batch(covers: List[Union[str, Path]], messages: List[str],
+                               outputs: List[Union[str, Path]], password: str) -> None:
+    """
+    Encode et chiffre plusieurs messages, chacun dans sa propre image.
+    
+    La clé n'est dérivée qu'une seule fois pour tout le lot, puis les images sont
+    encodées en parallèle dans des processus séparés. Chaque message reçoit son
+    propre nonce. Si l'encodage d'une image échoue, les images déjà encodées sont
+    conservées et les fichiers existants des autres sorties ne sont pas modifiés.
+
+    Args:
+        covers: Chemins des images sources
+        messages: Messages secrets, un par image source
+        outputs: Chemins où sauvegarder les images encodées, un par image source
+        password: Mot de passe pour le chiffrement
         
-        with Image.open(input_path) as img:
-            # Vérification de la capacité
-            width, height = img.size
-            if len(binary_message) > width * height * 3:
-                raise ValueError("Message trop long pour cette image")
-            
-            # Création d'une copie pour l'encodage
-            encoded = img.copy()
-            data_index = 0
-            
-            # Encodage du message chiffré
-            for y in range(height):
-                for x in range(width):
-                    pixel = list(img.getpixel((x, y)))
-                    for i in range(3):
-                        if data_index < len(binary_message):
-                            pixel[i] = (pixel[i] & ~1) | int(binary_message[data_index])
-                            data_index += 1
-                    encoded.putpixel((x, y), tuple(pixel))
-                    if data_index >= len(binary_message):
-                        break
-                if data_index >= len(binary_message):
-                    break
-            
-            # Sauvegarde sécurisée
-            encoded.save(output_path)
-            
-        print("Message caché dans l'image avec succès.")
+    Raises:
+        ValueError: Si les paramètres sont invalides
+        IOError: Si une erreur survient lors de la manipulation des fichiers
+    """
+    try:
+        # Validation de tout le lot avant toute lecture ou tout chiffrement
+        if not covers or not len(covers) == len(messages) == len(outputs):
+            raise ValueError("Il faut autant d'images sources, de messages et de chemins de sortie (au moins un)")
+        validated = [_validate_encode_inputs(*job) for job in zip(covers, messages, outputs)]
+        input_paths = [input_path for input_path, _ in validated]
+        save_paths = [save_path for _, save_path in validated]
+        if len(set(save_paths)) != len(save_paths):
+            raise ValueError("Chaque image encodée doit avoir un chemin de sortie distinct")
+        
+        key = generate_key(password)
+        with ProcessPoolExecutor(max_workers=min(len(input_paths), os.cpu_count() or 1)) as executor:
+            list(executor.map(_encode_with_key, input_paths, messages, save_paths, [key] * len(input_paths)))
+        
+        print(f"{len(input_paths)} messages cachés dans les images avec succès.")
         
     except Exception as e:
         print(f"Erreur lors de l'encodage : {str(e)}")
-        # Nettoyage en cas d'erreur
-        if 'encoded' in locals():
-            del encoded
-        if 'output_path' in locals() and Path(output_path).exists():
-            os.remove(output_path)
         raise
 
 def secure_decode_image(image_path: Union[str, Path], password: str) -> str:
@@ -146,31 +409,29 @@ def secure_decode_image(image_path: Union[str, Path], password: str) -> str:
     """
     try:
         input_path = validate_file_path(image_path)
-        f = Fernet(generate_key(password))
-        
-        binary_message = ''
-        encrypted_bytes = bytearray()
+        aesgcm = AESGCM(generate_key(password))
         
         with Image.open(input_path) as img:
-            # Extraction des bits
-            for y in range(img.height):
-                for x in range(img.width):
-                    pixel = img.getpixel((x, y))
-                    for i in range(3):
-                        binary_message += str(pixel[i] & 1)
-                        
-                        # Conversion en bytes tous les 8 bits
-                        if len(binary_message) >= 8:
-                            byte_val = int(binary_message[:8], 2)
-                            binary_message = binary_message[8:]
-                            
-                            # Vérification du marqueur de fin
-                            if byte_val == 255:  # Tous les bits à 1
-                                return f.decrypt(bytes(encrypted_bytes)).decode()
-                            
-                            encrypted_bytes.append(byte_val)
-                            
-        raise ValueError("Aucun message trouvé dans l'image")
+            rgb = _as_rgb(img)
+            if np is not None:
+                channels = np.asarray(rgb, dtype=np.uint8).reshape(-1)
+                extract_bytes = _extract_bytes
+            else:
+                channels = rgb.tobytes()
+                extract_bytes = _extract_bytes_pure
+        
+        # Lecture de la longueur puis des données chiffrées, sans parcourir le reste de l'image
+        capacity = len(channels) // 8
+        if capacity < HEADER_SIZE:
+            raise ValueError("Aucun message trouvé dans l'image")
+        length, = struct.unpack(HEADER_FORMAT, extract_bytes(channels, 0, HEADER_SIZE))
+        # Plus petit message valide : nonce, étiquette et au moins un octet chiffré
+        if length < NONCE_SIZE + TAG_SIZE + 1 or length > capacity - HEADER_SIZE:
+            raise ValueError("Aucun message trouvé dans l'image")
+        
+        encrypted_message = extract_bytes(channels, HEADER_SIZE, length)
+        nonce, ciphertext = encrypted_message[:NONCE_SIZE], encrypted_message[NONCE_SIZE:]
+        return aesgcm.decrypt(nonce, ciphertext, None).decode()
         
     except Exception as e:
         print(f"Erreur lors du décodage : {str(e)}")